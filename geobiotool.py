@@ -65,35 +65,19 @@ class GeoBioToolPlugin:
             return
 
         try:
-            from osgeo import gdal
-            import numpy as np
-            from collections import Counter
-
-            ds   = gdal.Open(raster_path)
-            band = ds.GetRasterBand(1)
-            data = band.ReadAsArray().astype(np.float32)
-            data[np.isnan(data)] = 0
-            data[np.isinf(data)] = 0
-            vals = data[(data > 0) & (data < 255)]
-            cnt  = Counter(vals)
-            total = sum(cnt.values())
-
-            def shannon(c):
-                ps = [v/total for v in c.values()]
-                return -sum(p*np.log(p) for p in ps if p>0)
-
-            def simpson(c):
-                ps = [v/total for v in c.values()]
-                return 1 - sum(p*p for p in ps)
-
-            s  = shannon(cnt)
-            si = simpson(cnt)
+            from .geobiotool_utils import diversity_indices, raster_class_counts
+
+            cnt  = raster_class_counts(raster_path)
+            total = int(cnt.sum())
+            s, si = diversity_indices(cnt)
 
             with open(save_path, 'w', encoding='utf-8') as f:
-                f.write("[GeoBioTool Results]\n")
-                f.write(f"Total pixel count: {total}\n")
-                f.write(f"Shannon–Wiener Index: {s:.4f}\n")
-                f.write(f"Simpson Index: {si:.4f}\n")
+                f.writelines([
+                    "[GeoBioTool Results]\n",
+                    f"Total pixel count: {total}\n",
+                    f"Shannon–Wiener Index: {s:.4f}\n",
+                    f"Simpson Index: {si:.4f}\n",
+                ])
 
             QMessageBox.information(None, "GeoBioTool", "Saved successfully!")
 
@@ -0,0 +1,87 @@
+# geobiotool_diversity_algorithm.py
+# -*- coding: utf-8 -*-
+import numpy as np
+from qgis.core import (
+    QgsProcessingAlgorithm,
+    QgsProcessingParameterRasterLayer,
+    QgsProcessingParameterString,
+    QgsProcessingParameterFileDestination,
+    QgsProcessingContext,
+    QgsProcessingFeedback,
+    QgsProcessingException
+)
+from qgis.PyQt.QtGui import QIcon
+
+from .geobiotool_utils import diversity_indices, raster_class_counts
+
+# Shared workflow of the raster diversity indices. Subclasses provide
+# name/displayName/createInstance, the report label and which of the
+# diversity_indices() values they report.
+class GeoBioToolDiversityAlgorithm(QgsProcessingAlgorithm):
+
+    index_label = ""
+    index_pos   = 0
+
+    def group(self) -> str:
+        return "1 Raster"
+
+    def groupId(self) -> str:
+        return "raster"
+
+    def icon(self) -> QIcon:
+        return QIcon(":/icons/icon.png")
+
+    def initAlgorithm(self, config=None):
+        self.addParameter(QgsProcessingParameterRasterLayer(
+            "INPUT", "Input classified raster"
+        ))
+        self.addParameter(QgsProcessingParameterString(
+            "CLASSES", "Target classes (e.g., 1,4,6 or 0-9)", optional=True
+        ))
+        self.addParameter(QgsProcessingParameterFileDestination(
+            "OUTPUT_TEXT", "Output text file", fileFilter="Text files (*.txt)"
+        ))
+
+    def parse_classes(self, s: str):
+        if not s:
+            return None
+        classes = set()
+        for token in s.split(','):
+            token = token.strip()
+            if '-' in token:
+                a, b = map(int, token.split('-'))
+                classes.update(range(a, b+1))
+            else:
+                classes.add(int(token))
+        return classes
+
+    def processAlgorithm(self, parameters, context: QgsProcessingContext, feedback: QgsProcessingFeedback) -> dict:
+        layer    = self.parameterAsRasterLayer(parameters, "INPUT", context)
+        selected = self.parse_classes(self.parameterAsString(parameters, "CLASSES", context))
+        out_txt  = self.parameterAsFileOutput(parameters, "OUTPUT_TEXT", context)
+
+        counts = raster_class_counts(layer.source(), selected)
+        total  = int(counts.sum())
+        if total == 0:
+            raise QgsProcessingException("No valid pixels found.")
+        # present class codes in ascending order with their pixel counts
+        classes = np.flatnonzero(counts)
+        n       = counts[classes]
+        props   = n / total
+        si      = diversity_indices(counts)[self.index_pos]
+
+        lines = [
+            f"Total pixels: {total}\n",
+            f"{self.index_label} Index: {si:.4f}\n\n",
+            "Class ID order and proportions:\n",
+        ]
+        lines.extend(f"  Class {cls}: {prop:.4f} ({c} pixels)\n"
+                     for cls, prop, c in zip(classes, props, n))
+        lines.append("\nTop classes by proportion:\n")
+        # stable on ties, so equal classes stay in ascending order
+        order = np.argsort(-n, kind="stable")
+        lines.extend(f"  Class {classes[k]}: {props[k]:.4f} ({n[k]} pixels)\n" for k in order)
+        with open(out_txt, "w", encoding="utf-8") as f:
+            f.writelines(lines)
+
+        return {"OUTPUT_TEXT": out_txt}
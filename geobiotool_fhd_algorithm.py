@@ -1,8 +1,8 @@
 # geobiotool_fhd_algorithm.py
 # -*- coding: utf-8 -*-
-import pandas as pd
+from functools import lru_cache
+
 import numpy as np
-import matplotlib.pyplot as plt
 from qgis.core import (
     QgsProcessingAlgorithm,
     QgsProcessingParameterFile,
@@ -15,6 +15,94 @@ from qgis.core import (
 )
 from qgis.PyQt.QtGui import QIcon
 
+from .geobiotool_utils import group_by_cell, read_xyz
+
+# up to this many heights a bincount beats np.histogram; past it the
+# edge-correction passes cost more than np.histogram's own binning
+FHD_BINCOUNT_MAX = 1 << 10
+
+# point count per 0.5 m height bin, on the same edges and with the same
+# closed top bin as np.histogram(zvals, np.arange(zmin, zmax + 0.5, 0.5))
+def fhd_bins(zvals):
+    edges = np.arange(zvals.min(), zvals.max() + 0.5, 0.5)
+    nb    = edges.size - 1
+    if nb < 1:
+        return np.zeros(0, np.int64)
+    if zvals.size > FHD_BINCOUNT_MAX:
+        return np.histogram(zvals, edges)[0]
+    idx = np.minimum(((zvals - edges[0]) * 2).astype(np.int64), nb - 1)
+    # heights on an edge can round into the neighbouring bin, move them back
+    idx -= zvals < edges[idx]
+    idx += (zvals >= edges[idx + 1]) & (idx < nb - 1)
+    return np.bincount(idx[zvals <= edges[-1]], minlength=nb)
+
+# FHD calculation function: Shannon entropy of 0.5 m height bins
+def compute_fhd(zvals):
+    h = fhd_bins(zvals)
+    p = h[h>0] / h.sum()
+    return -np.sum(p * np.log(p)) if len(p)>0 else np.nan
+
+# FHD of every cell, given heights sorted by cell and each cell's slice
+def compute_fhd_cells(z_sorted, starts, counts):
+    return np.array([compute_fhd(z_sorted[s0:s0+n]) for s0, n in zip(starts, counts)])
+
+@lru_cache(maxsize=None)
+def fhd_cells_kernel():
+    # compute_fhd_cells compiled with numba when it is installed; numba is
+    # slow to import, so this only happens on the first grid analysis
+    try:
+        from numba import njit, prange
+    except ImportError:
+        return compute_fhd_cells
+
+    # edge k of np.arange(zmin, zmax + 0.5, 0.5), filled the way numpy does
+    @njit(cache=True, nogil=True)
+    def fhd_edge(zmin, e1, k):
+        if k == 0:
+            return zmin
+        if k == 1:
+            return e1
+        return zmin + k * (e1 - zmin)
+
+    # same kernel compiled to native code, counting bins in a plain loop;
+    # no fastmath, so the edges are not contracted into FMAs
+    @njit(cache=True, nogil=True)
+    def fhd_kernel(zvals):
+        zmin = zvals.min()
+        nb   = int(np.ceil(((zvals.max() + 0.5) - zmin) / 0.5)) - 1
+        if nb < 1:
+            return np.nan
+        e1   = zmin + 0.5
+        top  = fhd_edge(zmin, e1, nb)
+        h    = np.zeros(nb, np.int64)
+        for v in zvals:
+            if v > top:
+                continue
+            k = min(int((v - zmin) * 2), nb - 1)
+            if v < fhd_edge(zmin, e1, k):
+                k -= 1
+            elif k < nb - 1 and v >= fhd_edge(zmin, e1, k + 1):
+                k += 1
+            h[k] += 1
+        total = h.sum()
+        fhd   = 0.0
+        for c in h:
+            if c > 0:
+                p = c / total
+                fhd -= p * np.log(p)
+        return fhd
+
+    # cells are independent, so spread them over all cores
+    @njit(cache=True, parallel=True)
+    def fhd_cells(z_sorted, starts, counts):
+        out = np.empty(starts.size)
+        for k in prange(starts.size):
+            s0 = starts[k]
+            out[k] = fhd_kernel(z_sorted[s0:s0+counts[k]])
+        return out
+
+    return fhd_cells
+
 class GeoBioToolFHDAlgorithm(QgsProcessingAlgorithm):
 
     def name(self) -> str:
@@ -69,57 +157,55 @@ class GeoBioToolFHDAlgorithm(QgsProcessingAlgorithm):
         out_csv  = self.parameterAsFileOutput(parameters, "OUTPUT_CSV", context)
         out_png  = self.parameterAsFileOutput(parameters, "OUTPUT_PNG", context)
 
-        # load CSV or whitespace-delimited ASCII
-        df = None
+        import pandas as pd
+
         try:
-            tmp = pd.read_csv(inp, sep=",", engine="python", encoding="utf-8")
-            tmp.columns = [c.strip().lower() for c in tmp.columns]
-            if {"x","y","z"}.issubset(tmp.columns):
-                df = tmp[["x","y","z"]].copy()
-        except:
-            pass
-        if df is None:
-            tmp = pd.read_csv(inp, sep=r"\s+", engine="python", comment="#", encoding="utf-8")
-            tmp.columns = [c.strip().lower() for c in tmp.columns]
-            if {"x","y","z"}.issubset(tmp.columns):
-                df = tmp[["x","y","z"]].copy()
-        if df is None:
+            xyz = read_xyz(inp)
+        except Exception as e:
+            raise QgsProcessingException(f"Cannot read input file: {e}")
+        if xyz is None:
             raise QgsProcessingException("Invalid file: must contain columns X, Y, Z")
-
-        # FHD calculation function
-        def compute_fhd(zvals):
-            bins = np.arange(np.min(zvals), np.max(zvals) + 0.5, 0.5)
-            h, _ = np.histogram(zvals, bins=bins)
-            p = h[h>0] / h.sum()
-            return -np.sum(p * np.log(p)) if len(p)>0 else np.nan
+        x, y, z = xyz
 
         # zone-wise calculation
         results = []
         if use_grid:
-            xmin, xmax = df.x.min(), df.x.max()
-            ymin, ymax = df.y.min(), df.y.max()
+            xmin, xmax = x.min(), x.max()
+            ymin, ymax = y.min(), y.max()
             x_edges = np.arange(xmin, xmax + grid, grid)
             y_edges = np.arange(ymin, ymax + grid, grid)
-            for i in range(len(x_edges)-1):
-                for j in range(len(y_edges)-1):
-                    cell = df[(df.x>=x_edges[i]) & (df.x< x_edges[i+1]) &
-                              (df.y>=y_edges[j]) & (df.y< y_edges[j+1])]
-                    if len(cell) < 20: 
-                        continue
-                    fhd = compute_fhd(cell.z.values)
+            nx, ny  = len(x_edges)-1, len(y_edges)-1
+
+            # assign every point to its cell once, against the edges themselves so
+            # points on an edge land in the cell above, then sort points by cell id
+            ix = np.searchsorted(x_edges, x, side="right") - 1
+            iy = np.searchsorted(y_edges, y, side="right") - 1
+            inside = (ix < nx) & (iy < ny)
+            cells, starts, counts, z_sorted = group_by_cell(ix[inside] * ny + iy[inside], z[inside])
+
+            # FHD raster for the heatmap, indexed [row=y, col=x]
+            Z = np.full((ny, nx), np.nan)
+            if cells.size:
+                zmeans = np.add.reduceat(z_sorted, starts) / counts
+                zmaxs  = np.maximum.reduceat(z_sorted, starts)
+                keep   = counts >= 20
+                fhds   = fhd_cells_kernel()(z_sorted, starts[keep], counts[keep])
+                for c, n, zmean, zmax, fhd in zip(cells[keep], counts[keep],
+                                                  zmeans[keep], zmaxs[keep], fhds):
+                    i, j = divmod(int(c), ny)
+                    Z[j, i] = fhd
                     results.append({
                         "x_min":     x_edges[i],
                         "y_min":     y_edges[j],
-                        "point_count": len(cell),
-                        "zmean":       cell.z.mean(),
-                        "zmax":        cell.z.max(),
+                        "point_count": int(n),
+                        "zmean":       zmean,
+                        "zmax":        zmax,
                         "FHD":         fhd
                     })
         else:
-            z = df.z.values
             results.append({
-                "x_min":       df.x.min(),
-                "y_min":       df.y.min(),
+                "x_min":       x.min(),
+                "y_min":       y.min(),
                 "point_count": len(z),
                 "zmean":       z.mean(),
                 "zmax":        z.max(),
@@ -132,18 +218,17 @@ class GeoBioToolFHDAlgorithm(QgsProcessingAlgorithm):
 
         # heatmap
         if use_grid and not df_out.empty:
-            pivot = df_out.pivot(index="y_min", columns="x_min", values="FHD")
-            X, Y = np.meshgrid(np.sort(pivot.columns), np.sort(pivot.index))
-            Z    = np.ma.masked_invalid(pivot.values)
-            fig, ax = plt.subplots(figsize=(8,6))
-            mesh = ax.pcolormesh(X, Y, Z, shading="auto")
+            from matplotlib.figure import Figure
+
+            fig = Figure(figsize=(8,6))
+            ax  = fig.subplots()
+            mesh = ax.pcolormesh(x_edges, y_edges, np.ma.masked_invalid(Z), shading="flat")
             fig.colorbar(mesh, ax=ax, label="FHD")
             ax.set_aspect("equal")
             ax.set_xlabel("X")
             ax.set_ylabel("Y")
             fig.tight_layout()
-            fig.savefig(out_png, dpi=300)
-            plt.close(fig)
+            fig.savefig(out_png, dpi=150)
             feedback.pushInfo(f"Saved PNG: {out_png}")
 
         return {"OUTPUT_CSV": out_csv, "OUTPUT_PNG": out_png}
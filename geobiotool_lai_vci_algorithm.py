@@ -1,8 +1,5 @@
 # -*- coding: utf-8 -*-
-import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-from scipy.stats import variation
 from qgis.core import (
     QgsProcessingAlgorithm,
     QgsProcessingParameterFile,
@@ -15,6 +12,8 @@ from qgis.core import (
 )
 from qgis.PyQt.QtGui import QIcon
 
+from .geobiotool_utils import cell_ids, grid_image, group_by_cell, read_xyz
+
 class GeoBioToolLAIVCIAlgorithm(QgsProcessingAlgorithm):
 
     def name(self) -> str:
@@ -62,103 +61,81 @@ class GeoBioToolLAIVCIAlgorithm(QgsProcessingAlgorithm):
         out_png_lai = self.parameterAsFileOutput(parameters, "OUTPUT_PNG_LAI", context)
         out_png_vci = self.parameterAsFileOutput(parameters, "OUTPUT_PNG_VCI", context)
 
+        import pandas as pd
+
         try:
-            df_all = pd.read_csv(inp, sep=r"\s+|,", engine="python", comment="#", encoding="utf-8")
+            xyz = read_xyz(inp)
         except Exception as e:
             raise QgsProcessingException(f"Cannot read input file: {e}")
-
-        cols = {c.lower(): c for c in df_all.columns}
-        xcol = next((orig for low, orig in cols.items() if low in ("x","x_coord","easting")), None)
-        ycol = next((orig for low, orig in cols.items() if low in ("y","y_coord","northing")), None)
-        zcol = next((orig for low, orig in cols.items() if low in ("z","z_coord","elevation","height")), None)
-        if not (xcol and ycol and zcol):
+        if xyz is None:
             raise QgsProcessingException("Input must contain X, Y, Z columns (or synonyms)")
 
-        df = df_all[[xcol, ycol, zcol]].copy().rename(columns={xcol:"x", ycol:"y", zcol:"z"})
-
-        if use_grid:
-            xmin, ymin = df.x.min(), df.y.min()
-            df["xg"] = np.floor((df.x - xmin)/gsz)*gsz + xmin
-            df["yg"] = np.floor((df.y - ymin)/gsz)*gsz + ymin
-        else:
-            df["xg"], df["yg"] = df["x"], df["y"]
+        # integer cell ids (grid cells, or distinct x/y when not gridded)
+        x, y, z = xyz
+        cell, xs, ys = cell_ids(x, y, gsz if use_grid else None)
+        cells, starts, counts, z_sorted = group_by_cell(cell, z)
 
         def compute_lai_vci(zvals, z0=3, dz=1):
-            # filter points above z0
-            above = zvals[zvals >= z0]
+            # filter points above z0, sorted so layer counts come from one search
+            above = np.sort(zvals[zvals >= z0])
             if len(above) < 1:
                 return np.nan, np.nan
 
-            max_h = above.max()
+            max_h = above[-1]
             layers = np.arange(z0, max_h + dz, dz)
 
             # compute Ni = #points ≥ layers[i]
-            counts = np.array([(above >= h).sum() for h in layers])
+            idx    = np.searchsorted(above, layers, side="left")
+            counts = len(above) - idx
 
             # compute LAD per layer: LAD[i] = log(Ni / N(i+1))
-            # note: skip last layer
-            lad_vals = []
-            for i in range(len(counts) - 1):
-                Ni  = counts[i]
-                Nj  = counts[i+1]
-                if Ni > 0 and Nj > 0:
-                    lad_vals.append(np.log(Ni / Nj))
-                else:
-                    lad_vals.append(np.nan)
-
-            lai_val = float(np.nansum(lad_vals))  # sum of LAD gives LAI
-
-            # VCI: coeff. of variation of histogram of 1m bins
-            hist_counts, _ = np.histogram(above, bins=layers)
+            # note: skip last layer and layers with no points above them
+            nz = counts[1:] > 0
+            lai_val = float(np.log(counts[:-1][nz] / counts[1:][nz]).sum())  # sum of LAD gives LAI
+
+            # VCI: coeff. of variation of histogram of 1m bins, read off the
+            # same search; the last bin is closed like np.histogram's
+            idx[-1] = np.searchsorted(above, layers[-1], side="right")
+            hist_counts = np.diff(idx)
             if hist_counts.sum() > 0 and hist_counts.mean() != 0:
-                vci_val = float(variation(hist_counts))
+                vci_val = float(hist_counts.std() / hist_counts.mean())
             else:
                 vci_val = np.nan
 
             return lai_val, vci_val
 
         records = []
-        for (yg, xg), sub in df.groupby(["yg","xg"]):
-            if len(sub) < 20:
-                continue
-            zvals = sub["z"].values
-            lai_val, vci_val = compute_lai_vci(zvals)
-            records.append({"yg": yg, "xg": xg, "LAI": lai_val, "VCI": vci_val})
+        keep = counts >= 20
+        for c, s0, n in zip(cells[keep], starts[keep], counts[keep]):
+            lai_val, vci_val = compute_lai_vci(z_sorted[s0:s0+n])
+            records.append({"yg": ys[c // xs.size], "xg": xs[c % xs.size], "LAI": lai_val, "VCI": vci_val})
 
         out_df = pd.DataFrame.from_records(records)
         out_df.to_csv(out_csv, index=False, encoding="utf-8")
         feedback.pushInfo(f"Saved CSV: {out_csv}")
 
         if not out_df.empty:
-            xs = np.sort(out_df["xg"].unique())
-            ys = np.sort(out_df["yg"].unique())
-            XX, YY = np.meshgrid(xs, ys)
-
-            def pivot_mask(df_in, col):
-                pv = df_in.pivot(index="yg", columns="xg", values=col)
-                pv = pv.reindex(index=ys, columns=xs)
-                return np.ma.masked_invalid(pv.values)
-
-            Z_lai = pivot_mask(out_df, "LAI")
-            plt.figure(figsize=(6,5))
-            plt.pcolormesh(XX, YY, Z_lai, shading='auto')
-            plt.colorbar(label="LAI")
-            plt.xlabel("X")
-            plt.ylabel("Y")
-            plt.tight_layout()
-            plt.savefig(out_png_lai, dpi=300)
-            plt.close()
+            from matplotlib.figure import Figure
+
+            xg, yg = out_df["xg"].to_numpy(), out_df["yg"].to_numpy()
+            xs, ys, Z_lai = grid_image(xg, yg, out_df["LAI"].to_numpy())
+            _,  _,  Z_vci = grid_image(xg, yg, out_df["VCI"].to_numpy())
+
+            # one figure for both maps: draw LAI, then swap in the VCI values
+            fig  = Figure(figsize=(6,5))
+            ax   = fig.subplots()
+            mesh = ax.pcolormesh(xs, ys, Z_lai, shading='auto')
+            cbar = fig.colorbar(mesh, ax=ax, label="LAI")
+            ax.set_xlabel("X")
+            ax.set_ylabel("Y")
+            fig.tight_layout()
+            fig.savefig(out_png_lai, dpi=150)
             feedback.pushInfo(f"Saved LAI PNG: {out_png_lai}")
 
-            Z_vci = pivot_mask(out_df, "VCI")
-            plt.figure(figsize=(6,5))
-            plt.pcolormesh(XX, YY, Z_vci, shading='auto')
-            plt.colorbar(label="VCI")
-            plt.xlabel("X")
-            plt.ylabel("Y")
-            plt.tight_layout()
-            plt.savefig(out_png_vci, dpi=300)
-            plt.close()
+            mesh.set_array(Z_vci)
+            mesh.autoscale()
+            cbar.set_label("VCI")
+            fig.savefig(out_png_vci, dpi=150)
             feedback.pushInfo(f"Saved VCI PNG: {out_png_vci}")
 
         return {
@@ -1,8 +1,5 @@
 # geobiotool_rugosity_algorithm.py
 # -*- coding: utf-8 -*-
-import pandas as pd
-import numpy as np
-import matplotlib.pyplot as plt
 from qgis.core import (
     QgsProcessingAlgorithm,
     QgsProcessingParameterFile,
@@ -15,6 +12,8 @@ from qgis.core import (
 )
 from qgis.PyQt.QtGui import QIcon
 
+from .geobiotool_utils import cell_ids, cell_mean_std, grid_image, group_by_cell, read_xyz
+
 class GeoBioToolRugosityAlgorithm(QgsProcessingAlgorithm):
 
     def name(self) -> str:
@@ -72,49 +71,44 @@ class GeoBioToolRugosityAlgorithm(QgsProcessingAlgorithm):
         out_csv  = self.parameterAsFileOutput(parameters, "OUTPUT_CSV", context)
         out_png  = self.parameterAsFileOutput(parameters, "OUTPUT_PNG", context)
 
+        import pandas as pd
+
         try:
-            df_all = pd.read_csv(inp, sep=r"\s+|,", engine="python", comment="#", encoding="utf-8")
+            xyz = read_xyz(inp)
         except Exception as e:
             raise QgsProcessingException(f"Cannot read input file: {e}")
-
-        cols_map = {col.lower(): col for col in df_all.columns}
-        x_col = next((orig for low, orig in cols_map.items() if low in ["x","x_coord","easting"]), None)
-        y_col = next((orig for low, orig in cols_map.items() if low in ["y","y_coord","northing"]), None)
-        z_col = next((orig for low, orig in cols_map.items() if low in ["z","z_coord","elevation","height"]), None)
-        if not all([x_col, y_col, z_col]):
+        if xyz is None:
             raise QgsProcessingException("Input must contain X, Y, Z columns or synonyms")
 
-        df = df_all[[x_col, y_col, z_col]].copy()
-        df.columns = ["x", "y", "z"]
-
-        if use_grid:
-            xmin, ymin = df["x"].min(), df["y"].min()
-            df["xg"] = np.floor((df["x"] - xmin) / gsz) * gsz + xmin
-            df["yg"] = np.floor((df["y"] - ymin) / gsz) * gsz + ymin
-        else:
-            df["xg"], df["yg"] = df["x"], df["y"]
-
-        def rugosity(group):
-            zvals = group["z"].values
-            return np.std(zvals)
-
-        df_out = df.groupby(["yg", "xg"]).apply(rugosity).reset_index(name="rugosity_index")
+        # integer cell ids (grid cells, or distinct x/y when not gridded)
+        x, y, z = xyz
+        cell, xs, ys = cell_ids(x, y, gsz if use_grid else None)
+        cells, starts, counts, z_sorted = group_by_cell(cell, z)
+
+        # rugosity = population sd of z per cell
+        _, sd  = cell_mean_std(z_sorted, starts, counts)
+        df_out = pd.DataFrame({
+            "yg":             ys[cells // xs.size],
+            "xg":             xs[cells % xs.size],
+            "rugosity_index": sd
+        })
         df_out.to_csv(out_csv, index=False, encoding="utf-8")
         feedback.pushInfo(f"Saved CSV: {out_csv}")
 
         if not df_out.empty:
-            pivot = df_out.pivot(index="yg", columns="xg", values="rugosity_index")
-            X, Y = np.meshgrid(np.sort(pivot.columns), np.sort(pivot.index))
-            Z    = np.ma.masked_invalid(pivot.values)
-            fig, ax = plt.subplots()
-            mesh    = ax.pcolormesh(X, Y, Z, shading="auto")
+            from matplotlib.figure import Figure
+
+            xs, ys, Z = grid_image(df_out["xg"].to_numpy(), df_out["yg"].to_numpy(),
+                                   df_out["rugosity_index"].to_numpy())
+            fig = Figure()
+            ax  = fig.subplots()
+            mesh    = ax.pcolormesh(xs, ys, Z, shading="auto")
             fig.colorbar(mesh, ax=ax, label="Rugosity Index")
             ax.set_aspect("equal")
             ax.set_xlabel("X")
             ax.set_ylabel("Y")
             fig.tight_layout()
-            fig.savefig(out_png, dpi=300)
-            plt.close(fig)
+            fig.savefig(out_png, dpi=150)
             feedback.pushInfo(f"Saved PNG: {out_png}")
 
         return {"OUTPUT_CSV": out_csv, "OUTPUT_PNG": out_png}
@@ -0,0 +1,163 @@
+# geobiotool_utils.py
+# -*- coding: utf-8 -*-
+import os
+from functools import lru_cache
+
+import numpy as np
+from osgeo import gdal
+
+# pixels per ReadAsArray window when streaming a raster band
+STRIP_PIXELS = 1 << 22
+
+# accepted (lower-case) header names of the point file columns
+XYZ_SYNONYMS = {
+    "x": ("x", "x_coord", "easting"),
+    "y": ("y", "y_coord", "northing"),
+    "z": ("z", "z_coord", "elevation", "height"),
+}
+
+
+def diversity_indices(counts):
+    # Shannon–Wiener and Simpson indices from per-class pixel counts,
+    # using -sum(p log p) = log(N) - sum(c log c) / N
+    c = np.asarray(counts)
+    c = c[c > 0].astype(np.float64)
+    total = c.sum()
+    if total == 0:
+        return 0.0, 1.0
+    shannon = np.log(total) - np.dot(c, np.log(c)) / total
+    simpson = 1 - np.dot(c, c) / (total * total)
+    return float(shannon), float(simpson)
+
+
+def class_lut(selected=None):
+    # boolean lookup indexed by class code; defaults to codes 1..254.
+    # The last slot is always False so out-of-range codes can be parked there.
+    size = max(256, max(selected) + 2) if selected else 256
+    lut  = np.zeros(size, dtype=bool)
+    if selected:
+        lut[np.fromiter(selected, dtype=np.int64)] = True
+    else:
+        lut[1:255] = True
+    return lut
+
+
+def class_counts(data, lut):
+    # pixel count per class code of an integer array, zero where lut is False
+    if data.dtype != np.uint8 and data.size and 0 <= data.min() and data.max() <= 255:
+        data = data.astype(np.uint8)  # codes fit in a byte: count them natively
+    if data.dtype.kind == "u" and data.dtype.itemsize <= 2:
+        counts = np.bincount(data.ravel(), minlength=lut.size)[:lut.size]
+    else:
+        # park negative and out-of-range codes in the always-False last bin
+        codes = np.clip(data, -1, lut.size - 1).astype(np.intp, copy=False).ravel()
+        codes[codes < 0] = lut.size - 1
+        counts = np.bincount(codes, minlength=lut.size)
+    counts[~lut] = 0
+    return counts
+
+
+def band_class_counts(band, selected=None):
+    # class counts of a GDAL band, read in full-width strips of whole blocks
+    # so the raster is never held in memory at once
+    lut    = class_lut(selected)
+    counts = np.zeros(lut.size, dtype=np.int64)
+    xsize, ysize = band.XSize, band.YSize
+    _, by  = band.GetBlockSize()
+    step   = max(by, (STRIP_PIXELS // max(xsize, 1)) // by * by)
+    for yoff in range(0, ysize, step):
+        block = band.ReadAsArray(0, yoff, xsize, min(step, ysize - yoff))
+        if block.dtype.kind == "f":
+            np.nan_to_num(block, copy=False, nan=0, posinf=0, neginf=0)
+            # only whole values are class codes, park fractions in the excluded bin
+            block[block != np.floor(block)] = -1
+            block = block.astype(np.int32)
+        counts += class_counts(block, lut)
+    return counts
+
+
+@lru_cache(maxsize=8)
+def cached_band_counts(path, mtime, selected):
+    # keyed on the file's mtime so an edited raster is read again
+    ds     = gdal.Open(path)
+    counts = band_class_counts(ds.GetRasterBand(1), selected)
+    counts.flags.writeable = False
+    return counts
+
+
+def raster_class_counts(path, selected=None):
+    # class counts of band 1 of a raster file; running several indices
+    # on the same raster and classes reads it only once
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        # not a plain file (e.g. a GDAL virtual path), nothing to key the cache on
+        ds = gdal.Open(path)
+        return band_class_counts(ds.GetRasterBand(1), selected)
+    return cached_band_counts(path, mtime, frozenset(selected) if selected else None)
+
+
+def grid_index(v, vmin, size):
+    # integer grid cell index of each coordinate
+    return np.floor((v - vmin) / size).astype(np.int64)
+
+
+def group_by_cell(cell, z):
+    # sort z by integer cell id so each cell is one contiguous slice;
+    # returns the cell ids, slice starts, point counts and the sorted z
+    order = np.argsort(cell, kind="stable")
+    cells, starts, counts = np.unique(cell[order], return_index=True, return_counts=True)
+    return cells, starts, counts, z[order]
+
+
+def cell_ids(x, y, size=None):
+    # integer cell id of every point, ordered by (y, x), plus the x/y value of
+    # each cell column/row: grid origins for a grid size, else the distinct coordinates
+    if size and x.size:
+        xmin, ymin = x.min(), y.min()
+        ix, iy = grid_index(x, xmin, size), grid_index(y, ymin, size)
+        xs = np.arange(ix.max() + 1) * size + xmin
+        ys = np.arange(iy.max() + 1) * size + ymin
+    else:
+        xs, ix = np.unique(x, return_inverse=True)
+        ys, iy = np.unique(y, return_inverse=True)
+    return iy * xs.size + ix, xs, ys
+
+
+def cell_mean_std(z_sorted, starts, counts):
+    # per-cell mean and population sd of z sorted by cell (see group_by_cell)
+    mu  = np.add.reduceat(z_sorted, starts) / counts
+    dev = z_sorted - np.repeat(mu, counts)
+    return mu, np.sqrt(np.add.reduceat(dev * dev, starts) / counts)
+
+
+def grid_image(xg, yg, values):
+    # dense [y, x] array of per-cell values over the sorted unique cell
+    # coordinates, masked where a cell has no value
+    xs, ix = np.unique(xg, return_inverse=True)
+    ys, iy = np.unique(yg, return_inverse=True)
+    Z = np.full((ys.size, xs.size), np.nan)
+    Z[iy, ix] = values
+    return xs, ys, np.ma.masked_invalid(Z)
+
+
+def read_xyz(path):
+    # x, y, z columns of a comma or whitespace delimited ASCII point file as
+    # contiguous float64 arrays, or None when a column is missing. The delimiter
+    # is picked from the header line so the file is parsed once by pandas' C engine.
+    import pandas as pd
+
+    with open(path, encoding="utf-8") as fh:
+        header = next((ln for ln in fh if ln.strip() and not ln.lstrip().startswith("#")), "")
+    sep   = "," if "," in header else r"\s+"
+    names = {n for syn in XYZ_SYNONYMS.values() for n in syn}
+    df_all = pd.read_csv(path, sep=sep, comment="#", encoding="utf-8", skipinitialspace=True,
+                         usecols=lambda c: c.strip().lower() in names)
+    cols = {c.strip().lower(): c for c in df_all.columns}
+    xyz  = []
+    for syn in XYZ_SYNONYMS.values():
+        col = next((orig for low, orig in cols.items() if low in syn), None)
+        if col is None:
+            return None
+        xyz.append(np.ascontiguousarray(df_all[col].to_numpy(dtype=np.float64)))
+    return tuple(xyz)